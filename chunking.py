@@ -6,10 +6,24 @@ Uses the by_title strategy optimized for financial/government documents.
 
 import json
 import logging
+import os
+import tempfile
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager, suppress
+from functools import partial
+from itertools import chain
+from multiprocessing import Pool
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, IO, Optional
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib json module
+    orjson = None
+
 from unstructured.chunking.title import chunk_by_title
 from unstructured.documents.elements import (
     Element, Title, NarrativeText, Text, 
@@ -17,9 +31,27 @@ from unstructured.documents.elements import (
 )
 
 
+# Documents with more elements than this are chunked in parallel shards
+PARALLEL_CHUNKING_THRESHOLD = 2000
+
+# Supported values for ChunkingConfig.strategy
+CHUNKING_STRATEGIES = ("by_title", "recursive")
+
+
 class ChunkingConfig:
     """Configuration for chunking parameters."""
     
+    __slots__ = (
+        "max_characters",
+        "new_after_n_chars",
+        "combine_text_under_n_chars",
+        "overlap",
+        "overlap_all",
+        "multipage_sections",
+        "strategy",
+        "emit_txt",
+    )
+    
     def __init__(
         self,
         max_characters: int = 1000,
@@ -27,7 +59,9 @@ class ChunkingConfig:
         combine_text_under_n_chars: int = 200,
         overlap: int = 50,
         overlap_all: bool = False,
-        multipage_sections: bool = True
+        multipage_sections: bool = True,
+        strategy: str = "by_title",
+        emit_txt: bool = False
     ):
         self.max_characters = max_characters
         self.new_after_n_chars = new_after_n_chars
@@ -35,6 +69,47 @@ class ChunkingConfig:
         self.overlap = overlap
         self.overlap_all = overlap_all
         self.multipage_sections = multipage_sections
+        # "by_title" or "recursive"; "recursive" ignores new_after_n_chars,
+        # combine_text_under_n_chars, overlap_all and multipage_sections
+        self.strategy = strategy
+        self.emit_txt = emit_txt  # Also write a human-readable .chunks.txt file
+        self.validate()
+    
+    def validate(self) -> None:
+        """Raise ValueError if the parameters are inconsistent."""
+        if self.strategy not in CHUNKING_STRATEGIES:
+            raise ValueError(
+                f"strategy must be one of {CHUNKING_STRATEGIES}, got {self.strategy!r}"
+            )
+        if self.max_characters <= 0:
+            raise ValueError(f"max_characters must be positive, got {self.max_characters}")
+        if not 0 <= self.overlap < self.max_characters:
+            raise ValueError(
+                f"overlap must be non-negative and less than max_characters, got {self.overlap}"
+            )
+        
+        # The remaining fields only apply to by_title. Values above
+        # max_characters are allowed; chunk_by_title clamps them.
+        if self.strategy != "by_title":
+            return
+        if self.new_after_n_chars < 0:
+            raise ValueError(f"new_after_n_chars must be non-negative, got {self.new_after_n_chars}")
+        if self.combine_text_under_n_chars < 0:
+            raise ValueError(
+                "combine_text_under_n_chars must be non-negative, "
+                f"got {self.combine_text_under_n_chars}"
+            )
+    
+    def as_kwargs(self) -> Dict[str, Any]:
+        """Return the keyword arguments for chunk_by_title."""
+        return {
+            "max_characters": self.max_characters,
+            "new_after_n_chars": self.new_after_n_chars,
+            "combine_text_under_n_chars": self.combine_text_under_n_chars,
+            "overlap": self.overlap,
+            "overlap_all": self.overlap_all,
+            "multipage_sections": self.multipage_sections,
+        }
 
 
 def setup_logging() -> logging.Logger:
@@ -50,118 +125,294 @@ def setup_logging() -> logging.Logger:
     return logging.getLogger(__name__)
 
 
+# Map element types to their classes
+_ELEMENT_TYPE_MAP = {
+    'Title': Title,
+    'NarrativeText': NarrativeText,
+    'UncategorizedText': Text,  # Map to generic Text element
+    'ListItem': ListItem,
+    'Table': Table,
+    'CompositeElement': CompositeElement,
+    'Text': Text
+}
+_DEFAULT_ELEMENT_CLASS = NarrativeText
+
+# Metadata fields carried over from the JSON into ElementMetadata
+_METADATA_KEYS = ('filename', 'filetype', 'languages', 'page_number', 'coordinates')
+
+
 def json_to_elements(json_data: List[Dict[str, Any]]) -> List[Element]:
     """Convert JSON data back to Unstructured Element objects."""
-    elements = []
-    
-    # Map element types to their classes
-    element_type_map = {
-        'Title': Title,
-        'NarrativeText': NarrativeText,
-        'UncategorizedText': Text,  # Map to generic Text element
-        'ListItem': ListItem,
-        'Table': Table,
-        'CompositeElement': CompositeElement,
-        'Text': Text
-    }
+    elements = [None] * len(json_data)
+    get_class = _ELEMENT_TYPE_MAP.get
     
-    for item in json_data:
-        element_type = item.get('type')
-        text = item.get('text', '')
-        metadata_dict = item.get('metadata', {})
-        element_id = item.get('element_id')
+    for i, item in enumerate(json_data):
+        metadata_dict = item.get('metadata')
         
-        # Create ElementMetadata object
-        metadata = ElementMetadata(
-            filename=metadata_dict.get('filename'),
-            filetype=metadata_dict.get('filetype'),
-            languages=metadata_dict.get('languages', []),
-            page_number=metadata_dict.get('page_number'),
-            coordinates=metadata_dict.get('coordinates')
-        )
+        # Create ElementMetadata object only when there is metadata to copy
+        metadata = None
+        if metadata_dict:
+            metadata = ElementMetadata(**{
+                key: metadata_dict[key] for key in _METADATA_KEYS if key in metadata_dict
+            })
         
         # Get the appropriate element class, default to NarrativeText
-        ElementClass = element_type_map.get(element_type, NarrativeText)
+        ElementClass = get_class(item.get('type'), _DEFAULT_ELEMENT_CLASS)
         
         # Create the element
-        element = ElementClass(text=text, metadata=metadata)
         # Note: element_id is read-only, so we can't set it directly
         # The chunking process will generate new IDs anyway
-        
-        elements.append(element)
+        elements[i] = ElementClass(text=item.get('text', ''), metadata=metadata)
     
     return elements
 
 
-def chunk_elements_by_title(elements: List[Element], config: ChunkingConfig) -> List[Element]:
-    """Chunk elements using the by_title strategy."""
-    return chunk_by_title(
-        elements,
-        max_characters=config.max_characters,
-        new_after_n_chars=config.new_after_n_chars,
-        combine_text_under_n_chars=config.combine_text_under_n_chars,
-        overlap=config.overlap,
-        overlap_all=config.overlap_all,
-        multipage_sections=config.multipage_sections
-    )
+def split_at_titles(elements: List[Element], n_shards: int) -> List[List[Element]]:
+    """Split elements into at most n_shards contiguous runs.
+    
+    The first run starts at the first element, whatever its type; every
+    later run starts at a Title.
+    """
+    shard_size = len(elements) / n_shards
+    boundaries = [0]
+    for i, element in enumerate(elements):
+        if isinstance(element, Title) and i - boundaries[-1] >= shard_size:
+            boundaries.append(i)
+    boundaries.append(len(elements))
+    
+    return [elements[start:end] for start, end in zip(boundaries, boundaries[1:])]
 
 
-def save_chunks(chunks: List[Element], output_file: Path, original_filename: str) -> None:
-    """Save chunked elements to JSON and text files."""
-    # Save as JSON
-    json_output = []
-    for i, chunk in enumerate(chunks):
-        chunk_data = {
-            'chunk_id': i + 1,
-            'text': chunk.text,
-            'type': chunk.__class__.__name__,
-            'metadata': {
-                'original_filename': original_filename,
-                'chunk_index': i + 1,
-                'character_count': len(chunk.text),
-                'word_count': len(chunk.text.split()),
-                'created_at': datetime.now().isoformat()
-            }
-        }
+def chunk_elements_by_title(
+    elements: List[Element],
+    config: ChunkingConfig,
+    shard_workers: Optional[int] = None
+) -> List[Element]:
+    """Chunk elements using the by_title strategy.
+    
+    Large documents are split at Title boundaries, where by_title starts a
+    new section anyway, and the shards are chunked in up to shard_workers
+    parallel processes (default: one per CPU).
+    """
+    chunker = partial(chunk_by_title, **config.as_kwargs())
+    if shard_workers is None:
+        shard_workers = os.cpu_count() or 1
+    
+    if shard_workers > 1 and len(elements) > PARALLEL_CHUNKING_THRESHOLD:
+        shards = split_at_titles(elements, shard_workers)
+        if len(shards) > 1:
+            with Pool(len(shards)) as pool:
+                return list(chain.from_iterable(pool.map(chunker, shards)))
+    
+    return chunker(elements)
+
+
+def chunk_elements_recursive(elements: List[Element], config: ChunkingConfig) -> List[Element]:
+    """Chunk the concatenated element text with LangChain's recursive splitter.
+    
+    Only max_characters and overlap apply. Each chunk keeps the filename,
+    page number and languages of its first contributing element, plus the
+    contributing elements as orig_elements.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=config.max_characters,
+        chunk_overlap=config.overlap,
+        length_function=len,
+        add_start_index=True
+    )
+    
+    # Record where each element starts in the joined text
+    parts = [element for element in elements if element.text]
+    starts = []
+    offset = 0
+    for element in parts:
+        starts.append(offset)
+        offset += len(element.text) + 2
+    text = "\n\n".join(element.text for element in parts)
+    
+    chunks = []
+    for split in splitter.create_documents([text]):
+        start = max(split.metadata["start_index"], 0)
+        first = bisect_right(starts, start) - 1
+        last = bisect_right(starts, start + len(split.page_content) - 1)
+        orig_elements = parts[first:last]
         
-        # Add original elements info if available
-        if hasattr(chunk.metadata, 'orig_elements') and chunk.metadata.orig_elements:
-            chunk_data['metadata']['original_elements_count'] = len(chunk.metadata.orig_elements)
-            chunk_data['metadata']['original_element_types'] = [
-                elem.__class__.__name__ for elem in chunk.metadata.orig_elements
-            ]
+        source = orig_elements[0].metadata
+        chunks.append(CompositeElement(
+            text=split.page_content,
+            metadata=ElementMetadata(
+                filename=source.filename,
+                page_number=source.page_number,
+                languages=source.languages,
+                orig_elements=orig_elements
+            )
+        ))
+    
+    return chunks
+
+
+def chunk_elements(
+    elements: List[Element],
+    config: ChunkingConfig,
+    shard_workers: Optional[int] = None
+) -> List[Element]:
+    """Chunk elements using the strategy selected in the configuration."""
+    if config.strategy == "recursive":
+        return chunk_elements_recursive(elements, config)
+    return chunk_elements_by_title(elements, config, shard_workers)
+
+
+# Process umask, so atomically written files get the usual permissions
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def atomic_open(path: Path, mode: str = 'wb', **kwargs) -> Iterator[IO]:
+    """Write to a temp file next to path and move it into place on success.
+    
+    Readers never see a partially written file, and a failed or interrupted
+    write leaves any previous file untouched.
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with open(fd, mode, **kwargs) as f:
+            yield f
+        # mkstemp creates files readable by the owner only
+        os.chmod(tmp_name, 0o666 & ~_UMASK)
+        os.replace(tmp_name, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.unlink(tmp_name)
+        raise
+
+
+def dump_json_bytes(obj: Any) -> bytes:
+    """Serialize an object to compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def save_chunks(
+    chunks: List[Element],
+    output_file: Path,
+    original_filename: str,
+    config: ChunkingConfig
+) -> None:
+    """Save chunked elements to a JSON file, and a text file if enabled.
+    
+    Chunks are streamed to disk one at a time. The JSON file is still a single
+    array, with one chunk object per line. Files only replace their final
+    path once fully written.
+    """
+    json_file = output_file.with_name(f"{output_file.name}.chunks.json")
+    txt_file = output_file.with_name(f"{output_file.name}.chunks.txt")
+    # Every chunk of a file shares the same creation time
+    created_at = datetime.now().isoformat()
+    
+    with ExitStack() as stack:
+        json_f = stack.enter_context(atomic_open(json_file, 'wb'))
+        json_f.write(b'[')
         
-        json_output.append(chunk_data)
-    
-    # Save JSON file
-    json_file = output_file.with_suffix('.chunks.json')
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(json_output, f, indent=2, ensure_ascii=False)
-    
-    # Save text file for easy reading
-    txt_file = output_file.with_suffix('.chunks.txt')
-    with open(txt_file, 'w', encoding='utf-8') as f:
-        f.write(f"CHUNKED DOCUMENT: {original_filename}\n")
-        f.write("=" * 80 + "\n\n")
+        txt_f = None
+        if config.emit_txt:
+            txt_f = stack.enter_context(atomic_open(txt_file, 'w', encoding='utf-8'))
+            txt_f.write(f"CHUNKED DOCUMENT: {original_filename}\n")
+            txt_f.write("=" * 80 + "\n\n")
         
         for i, chunk in enumerate(chunks):
-            f.write(f"CHUNK {i + 1}\n")
-            f.write("-" * 40 + "\n")
-            f.write(f"Characters: {len(chunk.text)}\n")
-            f.write(f"Words: {len(chunk.text.split())}\n")
-            f.write(f"Type: {chunk.__class__.__name__}\n\n")
-            f.write(chunk.text)
-            f.write("\n\n" + "=" * 80 + "\n\n")
+            text = chunk.text
+            chunk_type = type(chunk).__name__
+            n_chars = len(text)
+            n_words = len(text.split())
+            
+            chunk_data = {
+                'chunk_id': i + 1,
+                'text': text,
+                'type': chunk_type,
+                'metadata': {
+                    'original_filename': original_filename,
+                    'chunk_index': i + 1,
+                    'character_count': n_chars,
+                    'word_count': n_words,
+                    'created_at': created_at
+                }
+            }
+            
+            # Add original elements info if available
+            orig_elements = getattr(chunk.metadata, 'orig_elements', None)
+            if orig_elements:
+                chunk_data['metadata']['original_elements_count'] = len(orig_elements)
+                chunk_data['metadata']['original_element_types'] = [
+                    elem.__class__.__name__ for elem in orig_elements
+                ]
+            
+            # Save JSON record
+            json_f.write((b',\n' if i else b'\n') + dump_json_bytes(chunk_data))
+            
+            # Save text record for easy reading
+            if txt_f is not None:
+                txt_f.write(
+                    f"CHUNK {i + 1}\n"
+                    + "-" * 40 + "\n"
+                    + f"Characters: {n_chars}\n"
+                    + f"Words: {n_words}\n"
+                    + f"Type: {chunk_type}\n\n"
+                    + text
+                    + "\n\n" + "=" * 80 + "\n\n"
+                )
+        
+        json_f.write(b'\n]\n')
+
+
+def default_output_name(input_file: Path) -> str:
+    """Name chunk files after the source document, e.g. report.pdf.json -> report."""
+    return Path(input_file.stem).stem
+
 
+def assign_output_names(input_files: List[Path]) -> Dict[Path, str]:
+    """Give every input file a unique output name.
+    
+    Files whose default names collide, such as slides.pdf.json and
+    slides.pptx.json, keep their source extension (slides.pdf, slides.pptx).
+    """
+    names = {input_file: default_output_name(input_file) for input_file in input_files}
+    counts = Counter(names.values())
+    return {
+        input_file: name if counts[name] == 1 else input_file.stem
+        for input_file, name in names.items()
+    }
 
-def process_file(input_file: Path, output_dir: Path, config: ChunkingConfig, logger: logging.Logger) -> bool:
-    """Process a single JSON file for chunking."""
+
+def process_file(
+    input_file: Path,
+    output_dir: Path,
+    config: ChunkingConfig,
+    logger: Optional[logging.Logger] = None,
+    shard_workers: Optional[int] = None,
+    output_name: Optional[str] = None
+) -> bool:
+    """Process a single JSON file for chunking.
+    
+    shard_workers caps the processes used to chunk a single large document.
+    output_name defaults to default_output_name(input_file).
+    """
+    # Worker processes set up their own logger
+    if logger is None:
+        logger = setup_logging()
+    
     try:
         logger.info(f"Processing file: {input_file.name}")
         
         # Load JSON data
-        with open(input_file, 'r', encoding='utf-8') as f:
-            json_data = json.load(f)
+        if orjson is not None:
+            json_data = orjson.loads(input_file.read_bytes())
+        else:
+            with open(input_file, 'r', encoding='utf-8') as f:
+                json_data = json.load(f)
         
         if not json_data:
             logger.warning(f"Empty JSON file: {input_file.name}")
@@ -172,12 +423,12 @@ def process_file(input_file: Path, output_dir: Path, config: ChunkingConfig, log
         logger.info(f"Converted {len(elements)} elements from JSON")
         
         # Chunk the elements
-        chunks = chunk_elements_by_title(elements, config)
+        chunks = chunk_elements(elements, config, shard_workers)
         logger.info(f"Created {len(chunks)} chunks")
         
         # Save results
-        output_file = output_dir / input_file.stem
-        save_chunks(chunks, output_file, input_file.name)
+        output_file = output_dir / (output_name or default_output_name(input_file))
+        save_chunks(chunks, output_file, input_file.name, config)
         
         logger.info(f"Saved chunks for {input_file.name}")
         return True
@@ -207,10 +458,13 @@ def main():
         combine_text_under_n_chars=200,  # Combine small sections
         overlap=50,               # Small overlap for continuity
         overlap_all=False,        # Only overlap split chunks
-        multipage_sections=True   # Preserve cross-page sections
+        multipage_sections=True,  # Preserve cross-page sections
+        strategy="by_title",      # Or "recursive" for plain text splitting
+        emit_txt=False            # Set True to also write .chunks.txt files
     )
     
-    logger.info(f"Configuration: max_chars={config.max_characters}, "
+    logger.info(f"Configuration: strategy={config.strategy}, "
+                f"max_chars={config.max_characters}, "
                 f"new_after={config.new_after_n_chars}, "
                 f"combine_under={config.combine_text_under_n_chars}")
     
@@ -223,10 +477,27 @@ def main():
     
     logger.info(f"Found {len(json_files)} JSON files to process")
     
-    success_count = 0
-    for json_file in json_files:
-        if process_file(json_file, output_dir, config, logger):
-            success_count += 1
+    # Files are written in parallel, so no two may share an output name
+    output_names = assign_output_names(json_files)
+    for json_file, name in output_names.items():
+        if name != default_output_name(json_file):
+            logger.warning(f"Output name clash for {json_file.name}, writing {name}.chunks.json")
+    
+    # Files are independent, so chunk them in parallel across processes.
+    # Cores not needed for file-level workers go to sharding large documents,
+    # so the total process count stays around cpu_count.
+    cpu_count = os.cpu_count() or 1
+    max_workers = min(len(json_files), cpu_count)
+    shard_workers = max(1, cpu_count // max_workers)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                process_file, json_file, output_dir, config, None,
+                shard_workers, output_names[json_file]
+            )
+            for json_file in json_files
+        ]
+        success_count = sum(future.result() for future in as_completed(futures))
     
     logger.info(f"Chunking complete! Processed {success_count}/{len(json_files)} files successfully")
     logger.info(f"Output saved to: {output_dir}")
@@ -0,0 +1,18 @@
+"""
+Environment helpers shared by the preprocessing, setup and query scripts.
+"""
+
+import os
+from pathlib import Path
+
+
+def load_env_file(env_file: Path = Path(__file__).parent / '.env') -> None:
+    """Load KEY=VALUE pairs from a .env file into the environment, if it exists."""
+    if not env_file.exists():
+        return
+    
+    for line in env_file.read_text().splitlines():
+        line = line.strip()
+        if line and not line.startswith('#') and '=' in line:
+            key, value = line.split('=', 1)
+            os.environ[key.strip()] = value.strip().strip('"').strip("'")
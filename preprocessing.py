@@ -1,22 +1,17 @@
 import asyncio
 import os
 import json
+import aiofiles
 import unstructured_client
 from unstructured_client.models import shared, errors
-from pathlib import Path
-
-# Load .env file if it exists
-def load_env_file():
-    env_file = Path(__file__).parent / '.env'
-    if env_file.exists():
-        with open(env_file, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key.strip()] = value.strip().strip('"').strip("'")
-
-# Load environment variables
+from env import load_env_file
+
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib json module
+    orjson = None
+
+# Load environment variables from .env if it exists
 load_env_file()
 
 # Initialize client with API key from environment
@@ -28,29 +23,38 @@ client = unstructured_client.UnstructuredClient(
     api_key_auth=api_key
 )
 
+# Maximum number of files uploaded to the API at the same time
+MAX_CONCURRENT_FILES = 15
+
 async def partition_file_via_api(filename):
-    req = {
-        "partition_parameters": {
-            "files": {
-                "content": open(filename, "rb"),
-                "file_name": os.path.basename(filename),
-            },
-            "strategy": shared.Strategy.AUTO,
-            "vlm_model": "gpt-4o",
-            "vlm_model_provider": "openai",
-            "languages": ['eng'],
-            "split_pdf_page": True, 
-            "split_pdf_allow_failed": True,
-            "split_pdf_concurrency_level": 15
+    with open(filename, "rb") as f:
+        req = {
+            "partition_parameters": {
+                "files": {
+                    "content": f,
+                    "file_name": os.path.basename(filename),
+                },
+                "strategy": shared.Strategy.AUTO,
+                "vlm_model": "gpt-4o",
+                "vlm_model_provider": "openai",
+                "languages": ['eng'],
+                "split_pdf_page": True, 
+                "split_pdf_allow_failed": True,
+                "split_pdf_concurrency_level": 15
+            }
         }
-    }
 
-    try:
-        res = await client.general.partition_async(request=req)
-        return res.elements
-    except errors.UnstructuredClientError as e:
-        print(f"Error partitioning {filename}: {e.message}")
-        return []
+        try:
+            res = await client.general.partition_async(request=req)
+            return res.elements
+        except errors.UnstructuredClientError as e:
+            print(f"Error partitioning {filename}: {e.message}")
+            return []
+
+def encode_elements(elements):
+    if orjson is not None:
+        return orjson.dumps(elements)
+    return json.dumps(elements).encode("utf-8")
 
 async def process_file_and_save_result(input_filename, output_dir):
     elements = await partition_file_via_api(input_filename)
@@ -59,17 +63,30 @@ async def process_file_and_save_result(input_filename, output_dir):
         results_name = f"{os.path.basename(input_filename)}.json"
         output_filename = os.path.join(output_dir, results_name)
 
-        with open(output_filename, "w") as f:
-            json.dump(elements, f)
+        # Encode and write without blocking the event loop, so other uploads keep going
+        data = await asyncio.to_thread(encode_elements, elements)
+        async with aiofiles.open(output_filename, "wb") as f:
+            await f.write(data)
 
-def load_filenames_in_directory(input_dir):
-    filenames = []
+def iter_filenames_in_directory(input_dir):
     for root, _, files in os.walk(input_dir):
         for file in files:
             if not file.endswith('.json'):
-                filenames.append(os.path.join(root, file))
-
-    return filenames
+                yield os.path.join(root, file)
+
+async def process_queued_files(queue, output_dir):
+    # Files are only opened once a worker picks them up, so they are
+    # not all read up front
+    while True:
+        filename = await queue.get()
+        if filename is None:
+            break
+        # A failed file must not kill the worker, or the producer could block
+        # forever on a full queue once every worker has died
+        try:
+            await process_file_and_save_result(filename, output_dir)
+        except Exception as e:
+            print(f"Error processing {filename}: {e!r}")
 
 async def process_files():
     # Initialize with either a directory name, to process everything in the dir,
@@ -82,19 +99,26 @@ async def process_files():
     output_dir = "./output/"
 
     if input_dir:
-        filenames = load_filenames_in_directory(input_dir)
+        filenames = iter_filenames_in_directory(input_dir)
     else:
         filenames = input_files.split(",")
 
     os.makedirs(output_dir, exist_ok=True)
 
-    tasks = []
+    # A fixed pool of workers bounds concurrency, and the first uploads
+    # start while the directory is still being walked
+    queue = asyncio.Queue(maxsize=MAX_CONCURRENT_FILES)
+    workers = [
+        asyncio.create_task(process_queued_files(queue, output_dir))
+        for _ in range(MAX_CONCURRENT_FILES)
+    ]
+
     for filename in filenames:
-        tasks.append(
-            process_file_and_save_result(filename, output_dir)
-        )
+        await queue.put(filename)
+    for _ in workers:
+        await queue.put(None)
 
-    await asyncio.gather(*tasks)
+    await asyncio.gather(*workers)
 
 if __name__ == "__main__":
     asyncio.run(process_files())
\ No newline at end of file
@@ -5,28 +5,36 @@ Loads existing ChromaDB and provides interactive Q&A without rebuilding the syst
 """
 
 import os
+from functools import lru_cache
 from pathlib import Path
+from env import load_env_file
 
-# Load .env file if it exists
-def load_env_file():
-    env_file = Path(__file__).parent / '.env'
-    if env_file.exists():
-        with open(env_file, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key.strip()] = value.strip().strip('"').strip("'")
-
-# Load environment variables
+# Load environment variables from .env if it exists
 load_env_file()
 
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_core.embeddings import Embeddings
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 
 
+class QueryCachedEmbeddings(Embeddings):
+    """Embeddings wrapper that caches query embeddings for the session."""
+    
+    def __init__(self, embeddings: Embeddings, maxsize: int = 1024):
+        self.embeddings = embeddings
+        self._embed_query = lru_cache(maxsize=maxsize)(
+            lambda text: tuple(embeddings.embed_query(text))
+        )
+    
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+    
+    def embed_query(self, text):
+        return list(self._embed_query(text))
+
+
 def load_existing_rag_system():
     """Load existing RAG system from persisted ChromaDB."""
     
@@ -45,9 +53,9 @@ def load_existing_rag_system():
     print("Loading existing ChromaDB vector store...")
     
     # Setup embeddings (must match the ones used during creation)
-    embeddings = OpenAIEmbeddings(
+    embeddings = QueryCachedEmbeddings(OpenAIEmbeddings(
         model="text-embedding-3-small"
-    )
+    ))
     
     # Load existing vector store
     vectorstore = Chroma(
@@ -58,8 +66,8 @@ def load_existing_rag_system():
     # Create retriever
     print("Setting up retriever...")
     retriever = vectorstore.as_retriever(
-        search_type="similarity", 
-        search_kwargs={"k": 3}
+        search_type="mmr",  # Rerank locally for more diverse sources
+        search_kwargs={"k": 3, "fetch_k": 20, "lambda_mult": 0.5}
     )
     
     # Setup LLM (OpenAI GPT)
@@ -1,30 +1,52 @@
 # convert Unstructured elements to LangChain documents
 import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
+
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib json module
+    orjson = None
+
 from langchain_core.documents import Document
 
-def load_chunked_files():
-    """Load all chunked JSON files and convert to LangChain Documents."""
-    chunked_dir = Path(__file__).parent / 'chunked_output'
-    documents = []
-    
-    for json_file in chunked_dir.glob('*.chunks.json'):
+def load_chunked_file(json_file):
+    """Load one chunked JSON file and convert it to LangChain Documents."""
+    if orjson is not None:
+        chunks = orjson.loads(json_file.read_bytes())
+    else:
         with open(json_file, 'r', encoding='utf-8') as f:
             chunks = json.load(f)
+    
+    documents = []
+    for chunk in chunks:
+        # Keep only primitive values, which is all ChromaDB accepts
+        metadata = {
+            key: value for key, value in chunk.get('metadata', {}).items()
+            if isinstance(value, (str, int, float, bool))
+        }
+        metadata["source"] = metadata.get("original_filename", json_file.stem)
         
-        for chunk in chunks:
-            metadata = chunk.get('metadata', {})
-            metadata["source"] = metadata.get("original_filename", json_file.stem)
-            if "languages" in metadata:
-                del metadata["languages"]
-            
-            documents.append(Document(
-                page_content=chunk['text'], 
-                metadata=metadata
-            ))
+        documents.append(Document(
+            page_content=chunk['text'], 
+            metadata=metadata
+        ))
     
     return documents
 
+def load_chunked_files():
+    """Load all chunked JSON files and convert to LangChain Documents."""
+    chunked_dir = Path(__file__).parent / 'chunked_output'
+    json_files = sorted(chunked_dir.glob('*.chunks.json'))
+    if not json_files:
+        return []
+    
+    # Read files concurrently; disk reads release the GIL and overlap
+    with ThreadPoolExecutor(max_workers=min(32, len(json_files))) as executor:
+        per_file = executor.map(load_chunked_file, json_files)
+        return list(chain.from_iterable(per_file))
+
 # Usage: documents = load_chunked_files()
 
 if __name__ == "__main__":
@@ -4,29 +4,84 @@ Setup complete RAG system with OpenAI API.
 Creates vector store, retriever, and QA chain using ChromaDB and OpenAI models.
 """
 
+import hashlib
 import os
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from setupLangchain import load_chunked_files
+from env import load_env_file
 
-# Load .env file if it exists
-def load_env_file():
-    env_file = Path(__file__).parent / '.env'
-    if env_file.exists():
-        with open(env_file, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key.strip()] = value.strip().strip('"').strip("'")
-
-# Load environment variables
+# Load environment variables from .env if it exists
 load_env_file()
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain.vectorstores import utils as chromautils
+from langchain_core.embeddings import Embeddings
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 
+# Number of texts sent per embeddings request (OpenAI accepts up to 2048)
+EMBEDDING_BATCH_SIZE = 500
+# Number of embeddings requests in flight at once
+EMBEDDING_WORKERS = 4
+# HNSW index parameters, applied when the collection is first created
+HNSW_COLLECTION_METADATA = {
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64
+}
+
+
+class ConcurrentEmbeddings(Embeddings):
+    """Embed documents in batches, issuing several batch requests concurrently."""
+    
+    def __init__(self, embeddings: Embeddings, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 max_workers: int = EMBEDDING_WORKERS):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+    
+    def embed_documents(self, texts):
+        batches = [
+            texts[i:i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        if len(batches) <= 1:
+            return self.embeddings.embed_documents(texts)
+        
+        # Requests are network-bound, so threads overlap the round trips
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            results = executor.map(self.embeddings.embed_documents, batches)
+            return [vector for batch in results for vector in batch]
+    
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+def batched(items, size):
+    """Yield consecutive slices of at most size items."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def get_max_batch_size(vectorstore):
+    """Return the largest write the Chroma client accepts in one call."""
+    # chromadb >= 0.5.1 only has get_max_batch_size(); older clients
+    # expose a max_batch_size attribute instead
+    client = vectorstore._client
+    if hasattr(client, "get_max_batch_size"):
+        return client.get_max_batch_size()
+    return client.max_batch_size
+
+
+def open_vectorstore(embeddings):
+    """Open the persisted Chroma store, creating it with the HNSW settings if needed."""
+    return Chroma(
+        persist_directory="./chroma_db",  # Persist the database
+        embedding_function=embeddings,
+        collection_metadata=HNSW_COLLECTION_METADATA
+    )
+
 
 def setup_rag_system():
     """Setup complete RAG system with OpenAI models."""
@@ -47,23 +102,56 @@ def setup_rag_system():
         
     print(f"Loaded {len(documents)} documents")
     
-    # Filter complex metadata for ChromaDB compatibility
-    print("Filtering metadata for ChromaDB...")
-    docs = chromautils.filter_complex_metadata(documents)
-    
     # Setup embeddings (OpenAI)
     print("Setting up OpenAI embeddings...")
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-small"  # More cost-effective than ada-002
+    embeddings = ConcurrentEmbeddings(OpenAIEmbeddings(
+        model="text-embedding-3-small",  # More cost-effective than ada-002
+        chunk_size=EMBEDDING_BATCH_SIZE,
+        max_retries=6
+    ))
+    
+    # Cache embeddings on disk so unchanged chunks are not re-embedded
+    embeddings = CacheBackedEmbeddings.from_bytes_store(
+        embeddings,
+        LocalFileStore("./emb_cache"),
+        namespace="text-embedding-3-small",
+        key_encoder="sha256"
     )
     
-    # Create vector store
-    print("Creating ChromaDB vector store...")
-    vectorstore = Chroma.from_documents(
-        documents=docs, 
-        embedding=embeddings,
-        persist_directory="./chroma_db"  # Persist the database
-    )
+    # Open (or create) the persisted vector store
+    print("Opening ChromaDB vector store...")
+    vectorstore = open_vectorstore(embeddings)
+    
+    # Stores built before incremental updates use default HNSW settings and
+    # random ids, so rebuild them once from scratch
+    collection_metadata = vectorstore._collection.metadata or {}
+    if not HNSW_COLLECTION_METADATA.items() <= collection_metadata.items():
+        print("Existing ChromaDB store uses outdated settings, rebuilding it...")
+        vectorstore.delete_collection()
+        vectorstore = open_vectorstore(embeddings)
+    
+    # Key each chunk by its source and content, so identical text in
+    # different files is stored once per file
+    current_docs = {}
+    for doc in documents:
+        key = f"{doc.metadata['source']}\0{doc.page_content}"
+        current_docs.setdefault(hashlib.sha1(key.encode('utf-8')).hexdigest(), doc)
+    existing_ids = set(vectorstore.get(include=[])["ids"])
+    
+    # The store mirrors chunked_output: drop chunks that were edited or removed,
+    # and only embed chunks that are not already stored
+    stale_ids = [doc_id for doc_id in existing_ids if doc_id not in current_docs]
+    new_ids = [doc_id for doc_id in current_docs if doc_id not in existing_ids]
+    max_batch_size = get_max_batch_size(vectorstore)
+    
+    print(f"Removing {len(stale_ids)} outdated documents...")
+    for batch in batched(stale_ids, max_batch_size):
+        vectorstore.delete(ids=batch)
+    
+    print(f"Adding {len(new_ids)} new documents "
+          f"({len(existing_ids) - len(stale_ids)} already stored)...")
+    for batch in batched(new_ids, max_batch_size):
+        vectorstore.add_documents([current_docs[doc_id] for doc_id in batch], ids=batch)
     
     # Create retriever
     print("Setting up retriever...")